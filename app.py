@@ -1,24 +1,37 @@
 import os
+import re
+import json
 import logging
 import datetime
 import uuid
 import time
 import psutil
 import threading
+import functools
+import subprocess
+import multiprocessing
+import shutil
+import httpx
+import numpy as np
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # --- FLASK IMPORTS ---
 from flask import Flask, render_template, request, jsonify, Response, session
 from dotenv import load_dotenv
+import redis
 
 # --- AI & MEDIA IMPORTS ---
 from groq import Groq
 from gtts import gTTS
 from xhtml2pdf import pisa
 from pptx import Presentation
-import speech_recognition as sr
+from faster_whisper import WhisperModel, download_model
 import PIL.Image
-from moviepy.video.io.VideoFileClip import VideoFileClip
+import mozjpeg_lossless_optimization
+import imageio_ffmpeg
+from imaging import compress_to_jpeg, compress_jpeg_bytes
 
 # --- SETUP ENV ---
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -34,6 +47,39 @@ STATIC_FOLDER = os.path.join(basedir, 'static')
 if not os.path.exists(STATIC_FOLDER):
     os.makedirs(STATIC_FOLDER)
 
+# Shared client: reuses its keep-alive HTTP connection pool across requests.
+# The pool is sized so concurrent worker threads each keep a warm connection
+# instead of queueing behind httpx's small default keep-alive limit.
+GROQ_MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", 32))
+# Upper bound (seconds) on any outbound call, so a stalled upstream cannot
+# pin a worker thread indefinitely.
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 30))
+GROQ_CLIENT = Groq(
+    api_key=API_KEY,
+    timeout=UPSTREAM_TIMEOUT,
+    http_client=httpx.Client(limits=httpx.Limits(
+        max_connections=GROQ_MAX_CONNECTIONS,
+        max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+    )),
+) if API_KEY else None
+
+# Optional Redis store: keeps chat history server-side so the session cookie
+# only carries an ID. Without REDIS_URL history stays in the cookie session.
+REDIS_URL = os.environ.get("REDIS_URL")
+redis_client = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+CHAT_HISTORY_LEN = 6
+CHAT_HISTORY_TTL = 24 * 3600  # seconds an idle conversation is kept
+
+# Local speech-to-text model (multilingual; int8 weights run fast on CPU).
+# Either a model size name fetched from the Hugging Face hub once per
+# container, or a path to a bundled CTranslate2 model directory.
+ASR_MODEL = os.environ.get("ASR_MODEL", "base")
+ASR_SAMPLE_RATE = 16000
+ASR_MAX_SECONDS = int(os.environ.get("ASR_MAX_SECONDS", 600))
+
+# Bundled ffmpeg binary (falls back to IMAGEIO_FFMPEG_EXE / system ffmpeg)
+FFMPEG_BIN = imageio_ffmpeg.get_ffmpeg_exe()
+
 # --- ADMIN CONFIG ---
 ADMIN_USER = os.environ.get("ADMIN_USER", "Admin")
 ADMIN_PASS = os.environ.get("ADMIN_PASS", "admin123") 
@@ -45,10 +91,31 @@ global_stats = {
     "file_conv": 0, "compression": 0, "vid_audio": 0
 }
 
+# `+=` on a dict value is a read-modify-write; serialize it across threads
+_stats_lock = threading.Lock()
+
 def increment_stat(field):
-    if field in global_stats:
+    if field not in global_stats: return
+    if redis_client:
+        # Shared, atomic counter across all gunicorn worker processes
+        try:
+            redis_client.hincrby("stats", field, 1)
+            return
+        except redis.RedisError as e:
+            print(f"Stats Error: {e}")
+    with _stats_lock:
         global_stats[field] += 1
 
+def get_usage_stats():
+    """Returns usage counters, aggregated across workers when Redis is set."""
+    if redis_client:
+        try:
+            shared = redis_client.hgetall("stats")
+            return {k: int(shared.get(k.encode(), 0)) for k in global_stats}
+        except redis.RedisError as e:
+            print(f"Stats Error: {e}")
+    return dict(global_stats)
+
 # --- UTILITY: FILE CLEANUP ---
 def cleanup_old_files():
     """Deletes files in static folder older than 30 minutes to save space."""
@@ -64,39 +131,198 @@ def cleanup_old_files():
     except Exception as e:
         print(f"Cleanup Error: {e}")
 
-# Run cleanup in background on every request
-@app.before_request
-def before_request_cleanup():
-    if request.endpoint != 'static': 
-        threading.Thread(target=cleanup_old_files).start()
+CLEANUP_INTERVAL = 300  # seconds between sweeps of the static folder
+
+def _cleanup_loop():
+    while True:
+        cleanup_old_files()
+        time.sleep(CLEANUP_INTERVAL)
+
+# --- UTILITY: SYSTEM SAMPLER ---
+# cpu_percent needs a measurement window; sampling it here keeps that wait
+# off the request path so /api/stats just reads the latest values.
+_CPU_LAST = 0.0
+_RAM_LAST = 0.0
+
+def _system_sampler_loop():
+    global _CPU_LAST, _RAM_LAST
+    while True:
+        try:
+            _CPU_LAST = psutil.cpu_percent(interval=1.0)
+            _RAM_LAST = psutil.virtual_memory().percent
+        except Exception: time.sleep(1.0)
+
+_background_pid = None
+
+def start_background_jobs():
+    """Starts the cleanup sweeper and system sampler once per process.
+
+    Not run at import: with preload_app the gunicorn master would start
+    threads and then fork. gunicorn's post_fork hook calls this in every
+    worker, and the __main__ block does for the development server.
+    """
+    global _background_pid
+    if _background_pid == os.getpid(): return
+    _background_pid = os.getpid()
+    # One long-lived background sweeper instead of a new thread per request
+    threading.Thread(target=_cleanup_loop, name="static-cleanup", daemon=True).start()
+    threading.Thread(target=_system_sampler_loop, name="system-sampler", daemon=True).start()
 
 # --- UTILITY: CLEAN AI TEXT ---
+_FENCE_RE = re.compile(r"```(?:html|json)?")
+
 def clean_ai_text(text):
     """Removes Markdown fences like ```html from AI response."""
     if not text: return ""
-    return text.replace("```html", "").replace("```json", "").replace("```", "").strip()
+    return _FENCE_RE.sub("", text).strip()
+
+# --- UTILITY: PDF RENDERING ---
+def render_pdf(html):
+    """Renders an HTML string to PDF bytes."""
+    buf = BytesIO()
+    # pisa parses str sources directly; no need to encode into a second buffer
+    # err also counts non-fatal CSS/markup problems that still yield a
+    # usable document, so only an empty output is treated as a failure.
+    pisa.CreatePDF(html, dest=buf, encoding='utf-8')
+    if not buf.getbuffer().nbytes:
+        raise RuntimeError("PDF rendering failed")
+    return buf.getvalue()
+
+def pdf_attachment(pdf_bytes, filename):
+    """Returns PDF bytes as a download, skipping the static-file round trip."""
+    return Response(
+        pdf_bytes,
+        mimetype="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def save_static_file(fname, data):
+    """Writes data into the static folder atomically and returns its URL."""
+    path = os.path.join(STATIC_FOLDER, fname)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return f"/static/{fname}"
 
 # --- UTILITY: AI WRAPPER ---
+def _call_groq(system_prompt, user_prompt, temperature):
+    completion = GROQ_CLIENT.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=temperature,
+        max_tokens=2048
+    )
+    return completion.choices[0].message.content
+
+# Deterministic (temperature=0) prompts always yield the same answer, so
+# identical requests are served from memory. Errors raise and are never cached.
+# Prompts are part of the cache key, so oversized ones bypass the cache to
+# keep its memory bounded (~512 x CACHE_MAX_PROMPT_CHARS).
+CACHE_MAX_PROMPT_CHARS = int(os.environ.get("CACHE_MAX_PROMPT_CHARS", 8000))
+
+@functools.lru_cache(maxsize=512)
+def _cached_groq(system_prompt, user_prompt, temperature):
+    return _call_groq(system_prompt, user_prompt, temperature)
+
 def get_groq_response(system_prompt, user_prompt, temperature=0.5):
-    if not API_KEY:
+    if not GROQ_CLIENT:
         print("❌ Error: API Key is missing.")
         return None
     try:
-        client = Groq(api_key=API_KEY)
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=temperature,
-            max_tokens=2048
-        )
-        return completion.choices[0].message.content
+        if temperature == 0 and len(system_prompt) + len(user_prompt) <= CACHE_MAX_PROMPT_CHARS:
+            return _cached_groq(system_prompt, user_prompt, temperature)
+        return _call_groq(system_prompt, user_prompt, temperature)
     except Exception as e:
         print(f"❌ Groq API Error: {e}")
         return None
 
+# --- UTILITY: SPEECH RECOGNITION ---
+_asr_model = None
+_asr_lock = threading.Lock()
+
+def download_asr_model():
+    """Fetches the Whisper weights into the local cache (no-op for a path)."""
+    if not os.path.isdir(ASR_MODEL):
+        download_model(ASR_MODEL)
+
+def get_asr_model():
+    """Loads the Whisper model once per process; concurrent callers wait.
+
+    A failed load (hub unreachable, bad ASR_MODEL) is not cached, so the
+    next transcription request tries again.
+    """
+    global _asr_model
+    with _asr_lock:
+        if _asr_model is None:
+            try:
+                _asr_model = WhisperModel(ASR_MODEL, device="cpu", compute_type="int8")
+            except Exception as e:
+                print(f"ASR Model Error: {e}")
+                raise RuntimeError("Speech recognition model is unavailable") from e
+    return _asr_model
+
+def load_asr_audio(path):
+    """Decodes up to ASR_MAX_SECONDS of a file as 16kHz mono float32 samples.
+
+    Returns (samples, truncated). One extra second is decoded so a longer
+    recording can be told apart from one that is exactly at the limit.
+    """
+    raw = subprocess.run(
+        [FFMPEG_BIN, "-nostdin", "-loglevel", "error", "-i", path,
+         "-t", str(ASR_MAX_SECONDS + 1), "-ac", "1", "-ar", str(ASR_SAMPLE_RATE),
+         "-f", "s16le", "pipe:1"],
+        check=True, capture_output=True
+    ).stdout
+    samples = np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+    max_samples = ASR_MAX_SECONDS * ASR_SAMPLE_RATE
+    return samples[:max_samples], len(samples) > max_samples
+
+# --- UTILITY: CHAT HISTORY ---
+def _chat_key():
+    if 'chat_id' not in session:
+        session['chat_id'] = uuid.uuid4().hex
+    return f"chat:{session['chat_id']}"
+
+# A Redis outage degrades chat to no memory instead of failing the request
+
+def load_chat_history():
+    if not redis_client:
+        return session.get('chat_history', [])
+    try:
+        return [json.loads(m) for m in redis_client.lrange(_chat_key(), 0, -1)]
+    except redis.RedisError as e:
+        print(f"Chat History Error: {e}")
+        return []
+
+def append_chat_history(*messages):
+    if not redis_client:
+        history = session.get('chat_history', []) + list(messages)
+        session['chat_history'] = history[-CHAT_HISTORY_LEN:]
+        return
+    key = _chat_key()
+    try:
+        pipe = redis_client.pipeline()
+        pipe.rpush(key, *(json.dumps(m) for m in messages))
+        pipe.ltrim(key, -CHAT_HISTORY_LEN, -1)
+        pipe.expire(key, CHAT_HISTORY_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        print(f"Chat History Error: {e}")
+
+def clear_chat_history():
+    session.pop('chat_history', None)
+    if redis_client and 'chat_id' in session:
+        try:
+            redis_client.delete(_chat_key())
+        except redis.RedisError as e:
+            print(f"Chat History Error: {e}")
+        # A fresh ID starts a clean conversation even if the delete failed
+        session.pop('chat_id', None)
+
 # ==============================================================================
 #                               CORE ROUTES
 # ==============================================================================
@@ -133,41 +359,42 @@ def get_stats():
     cpu, ram = 0, 0
     # Only calculate stats if admin is logged in (saves resources)
     if session.get('is_admin', False):
-        try:
-            # FIX: interval=0.1 forces psutil to measure over 0.1s
-            # This fixes the "0.0%" issue
-            cpu = psutil.cpu_percent(interval=0.1) 
-            ram = psutil.virtual_memory().percent
-        except: pass
-    return jsonify({"cpu": cpu, "ram": ram, "usage": global_stats})
+        cpu, ram = _CPU_LAST, _RAM_LAST
+    return jsonify({"cpu": cpu, "ram": ram, "usage": get_usage_stats()})
 
-@app.route('/download-report')
-def download_report():
-    if not session.get('is_admin'):
-        return "Unauthorized", 401
-    
-    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Reports are rebuilt at most once a minute unless usage changes
+@functools.lru_cache(maxsize=1)
+def _build_report(generated, usage_items):
     report_lines = [
         "========================================",
         "       AI WORKSPACE SYSTEM REPORT       ",
         "========================================",
-        f"Generated: {now}",
-        f"Server CPU: {psutil.cpu_percent(interval=0.1)}%",
-        f"Server RAM: {psutil.virtual_memory().percent}%",
+        f"Generated: {generated}",
+        f"Server CPU: {_CPU_LAST}%",
+        f"Server RAM: {_RAM_LAST}%",
         "",
         "----------- FEATURE USAGE ------------",
     ]
     
-    total_ops = sum(global_stats.values())
-    for k, v in global_stats.items():
+    total_ops = sum(v for _, v in usage_items)
+    for k, v in usage_items:
         report_lines.append(f"{k.ljust(15)} : {v}")
     
     report_lines.append("--------------------------------------")
     report_lines.append(f"TOTAL OPERATIONS : {total_ops}")
     report_lines.append("========================================")
+    return "\n".join(report_lines)
+
+@app.route('/download-report')
+def download_report():
+    if not session.get('is_admin'):
+        return "Unauthorized", 401
+    
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+    report = _build_report(now, tuple(get_usage_stats().items()))
     
     return Response(
-        "\n".join(report_lines), 
+        report, 
         mimetype="text/plain", 
         headers={"Content-disposition": f"attachment; filename=System_Report.txt"}
     )
@@ -182,21 +409,23 @@ def chat():
     msg = request.form.get('message', '')
     if not msg: return jsonify({"success": False, "error": "Empty message"}), 400
 
-    history = session.get('chat_history', [])
+    history = load_chat_history()
     sys_msg = {"role": "system", "content": "You are a helpful AI office assistant. Be concise."}
     messages = [sys_msg] + history + [{"role": "user", "content": msg}]
     
+    if not GROQ_CLIENT:
+        return jsonify({"success": False, "error": "API Key is missing"}), 500
+
     try:
-        client = Groq(api_key=API_KEY)
-        completion = client.chat.completions.create(
+        completion = GROQ_CLIENT.chat.completions.create(
             model="llama-3.3-70b-versatile", messages=messages, temperature=0.7
         )
         ai_reply = completion.choices[0].message.content
         
-        history.append({"role": "user", "content": msg})
-        history.append({"role": "assistant", "content": ai_reply})
-        if len(history) > 6: history = history[-6:]
-        session['chat_history'] = history
+        append_chat_history(
+            {"role": "user", "content": msg},
+            {"role": "assistant", "content": ai_reply}
+        )
         
         return jsonify({"success": True, "response": ai_reply})
     except Exception as e:
@@ -204,7 +433,7 @@ def chat():
 
 @app.route('/clear-chat', methods=['POST'])
 def clear_chat():
-    session.pop('chat_history', None)
+    clear_chat_history()
     return jsonify({"success": True})
 
 @app.route('/generate-minutes', methods=['POST'])
@@ -234,18 +463,22 @@ def review_code():
     code = request.form.get('code', '')
     res = get_groq_response(
         "You are a Senior Developer. Review this code, find bugs, and suggest fixes. Use Markdown.",
-        code
+        code,
+        temperature=0
     )
     return jsonify({"success": True, "review": res if res else "AI Service Busy"})
 
 @app.route('/translate', methods=['POST'])
 def translate():
     increment_stat('text_gen')
-    text = request.form.get('text', '')
+    # Surrounding whitespace doesn't change a translation; stripping it lets
+    # re-pasted text hit the AI cache
+    text = request.form.get('text', '').strip()
     target = request.form.get('target_language', 'English')
     res = get_groq_response(
         "You are a professional translator. Output ONLY the translated text.",
-        f"Translate this text to {target}:\n{text}"
+        f"Translate this text to {target}:\n{text}",
+        temperature=0
     )
     return jsonify({"success": True, "translation": res if res else "Error"})
 
@@ -313,12 +546,14 @@ def generate_quiz():
     """
     
     fname = f"quiz_{uuid.uuid4().hex[:8]}.pdf"
-    path = os.path.join(STATIC_FOLDER, fname)
     
     try:
-        with open(path, "w+b") as f:
-            pisa.CreatePDF(BytesIO(pdf_html.encode('utf-8')), dest=f)
-        return jsonify({"success": True, "quiz": clean_html, "file_url": f"/static/{fname}"})
+        pdf_bytes = render_pdf(pdf_html)
+        # ?download=1 streams the PDF back directly instead of a file URL
+        if request.args.get('download') == '1':
+            return pdf_attachment(pdf_bytes, fname)
+        file_url = save_static_file(fname, pdf_bytes)
+        return jsonify({"success": True, "quiz": clean_html, "file_url": file_url})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -329,20 +564,6 @@ def make_ppt():
     topic = request.form.get('topic', 'Presentation')
     src_text = request.form.get('source_text', '')
     template_file = request.files.get('template_file')
-    
-    prs = None
-    temp_path = None
-
-    # Load Template or Default
-    try:
-        if template_file and template_file.filename != '':
-            temp_path = os.path.join(STATIC_FOLDER, f"temp_{uuid.uuid4().hex}.pptx")
-            template_file.save(temp_path)
-            prs = Presentation(temp_path)
-        else:
-            prs = Presentation()
-    except:
-        prs = Presentation()
 
     prompt = (
         f"Create a presentation outline for '{topic}'. Context: {src_text}.\n"
@@ -356,9 +577,17 @@ def make_ppt():
     
     ai_text = get_groq_response("You are a presentation generator.", prompt)
     if not ai_text:
-        if temp_path: os.remove(temp_path)
         return jsonify({"success": False, "error": "AI Failed"})
 
+    # Load Template or Default (parsed straight from the upload, no temp file)
+    try:
+        if template_file and template_file.filename != '':
+            prs = Presentation(BytesIO(template_file.read()))
+        else:
+            prs = Presentation()
+    except:
+        prs = Presentation()
+
     cleaned_text = clean_ai_text(ai_text)
     slide = None
     
@@ -381,9 +610,6 @@ def make_ppt():
 
     filename = f"presentation_{uuid.uuid4().hex[:8]}.pptx"
     prs.save(os.path.join(STATIC_FOLDER, filename))
-    
-    if temp_path and os.path.exists(temp_path):
-        os.remove(temp_path)
         
     return jsonify({"success": True, "file_url": f"/static/{filename}"})
 
@@ -402,7 +628,7 @@ def text_to_audio():
     try:
         fname = f"speech_{uuid.uuid4().hex[:8]}.mp3"
         path = os.path.join(STATIC_FOLDER, fname)
-        tts = gTTS(text=text, lang=lang, slow=False)
+        tts = gTTS(text=text, lang=lang, slow=False, timeout=UPSTREAM_TIMEOUT)
         tts.save(path)
         return jsonify({"success": True, "file_url": f"/static/{fname}"})
     except Exception as e:
@@ -421,12 +647,13 @@ def audio_to_text():
     file.save(path)
     
     try:
-        r = sr.Recognizer()
-        with sr.AudioFile(path) as source:
-            audio_data = r.record(source)
-            text = r.recognize_google(audio_data, language=lang)
+        # Whisper takes bare ISO codes ("en"), the UI sends locales ("en-US")
+        audio, truncated = load_asr_audio(path)
+        segments, _ = get_asr_model().transcribe(audio, language=lang.split('-')[0], beam_size=1)
+        text = " ".join(seg.text.strip() for seg in segments)
         os.remove(path)
-        return jsonify({"success": True, "text": text})
+        # truncated: only the first ASR_MAX_SECONDS were transcribed
+        return jsonify({"success": True, "text": text, "truncated": truncated, "max_seconds": ASR_MAX_SECONDS})
     except Exception as e:
         if os.path.exists(path): os.remove(path)
         return jsonify({"success": False, "error": str(e)}), 500
@@ -437,38 +664,118 @@ def text_to_pdf():
     html_content = request.form.get('html_content', '')
     styled_html = f"<html><body><style>body{{font-family:Helvetica;}}</style>{html_content}</body></html>"
     fname = f"doc_{uuid.uuid4().hex[:8]}.pdf"
-    path = os.path.join(STATIC_FOLDER, fname)
     try:
-        with open(path, "w+b") as f:
-            pisa.CreatePDF(BytesIO(styled_html.encode('utf-8')), dest=f)
-        return jsonify({"success": True, "file_url": f"/static/{fname}"})
+        pdf_bytes = render_pdf(styled_html)
+        if request.args.get('download') == '1':
+            return pdf_attachment(pdf_bytes, fname)
+        return jsonify({"success": True, "file_url": save_static_file(fname, pdf_bytes)})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _ffmpeg_audio_cmd(src, audio_path):
+    # Demux the audio track only; video frames are never decoded
+    return [FFMPEG_BIN, "-y", "-loglevel", "error", "-i", src,
+            "-vn", "-acodec", "libmp3lame", "-b:a", "128k", audio_path]
+
+# Top-level atoms that can open an MP4/MOV (ISO base media) file
+_ISO_BMFF_ATOMS = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'}
+
+def _is_pipe_friendly(stream):
+    """False for MP4/MOV uploads whose moov index sits after the media data.
+
+    ffmpeg can't demux those from a pipe, so they need a seekable file.
+    Walks the top-level atom headers only; the stream is left at offset 0.
+    """
+    try:
+        pos = 0
+        for _ in range(64):
+            stream.seek(pos)
+            header = stream.read(16)
+            if len(header) < 8: return True
+            size, kind = int.from_bytes(header[:4], 'big'), header[4:8]
+            if pos == 0 and kind not in _ISO_BMFF_ATOMS:
+                return True  # Not MP4/MOV (mkv, webm, avi...): streamable
+            if kind == b'moov': return True
+            if kind == b'mdat': return False
+            if size == 1 and len(header) == 16: size = int.from_bytes(header[8:16], 'big')
+            if size < 8: return False  # size 0 = "runs to EOF", or corrupt
+            pos += size
+        return False
+    finally:
+        stream.seek(0)
+
+def _pipe_audio_to_mp3(stream, audio_path):
+    """Feeds an upload stream into ffmpeg's stdin."""
+    proc = subprocess.Popen(
+        _ffmpeg_audio_cmd("pipe:0", audio_path),
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        shutil.copyfileobj(stream, proc.stdin)
+    except BrokenPipeError:
+        pass  # ffmpeg stopped reading; its exit code tells us why
+    finally:
+        try: proc.stdin.close()
+        except BrokenPipeError: pass
+    if proc.wait() != 0:
+        raise RuntimeError("Could not extract audio from this video")
+
 @app.route('/video-to-audio', methods=['POST'])
 def video_to_audio():
     increment_stat('vid_audio')
     if 'file' not in request.files: return jsonify({"success": False, "error": "No file"}), 400
     
     file = request.files['file']
-    vid_name = f"temp_vid_{uuid.uuid4().hex[:8]}.mp4"
-    vid_path = os.path.join(STATIC_FOLDER, vid_name)
-    file.save(vid_path)
-    
     audio_name = f"extracted_{uuid.uuid4().hex[:8]}.mp3"
     audio_path = os.path.join(STATIC_FOLDER, audio_name)
+    vid_path = None
     
     try:
-        with VideoFileClip(vid_path) as clip:
-            clip.audio.write_audiofile(audio_path, logger=None)
+        if _is_pipe_friendly(file.stream):
+            _pipe_audio_to_mp3(file.stream, audio_path)
+        else:
+            vid_path = os.path.join(STATIC_FOLDER, f"temp_vid_{uuid.uuid4().hex[:8]}.mp4")
+            file.save(vid_path)
+            subprocess.run(
+                _ffmpeg_audio_cmd(vid_path, audio_path),
+                stdin=subprocess.DEVNULL, check=True, capture_output=True
+            )
         return jsonify({"success": True, "file_url": f"/static/{audio_name}"})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
     finally:
-        if os.path.exists(vid_path):
+        if vid_path and os.path.exists(vid_path):
             try: os.remove(vid_path)
             except: pass
 
+# --- BATCH IMAGE POOL ---
+# JPEG encoding is single-threaded per image, so batches fan out across
+# processes. Spawned (not forked) workers avoid inheriting this process's
+# threads and locks. Under gunicorn they import only imaging.py; under
+# `python app.py` spawn re-imports app.py as __mp_main__ (without running
+# its __main__ block). The pool is per web worker, so keep it small.
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 20))
+IMAGE_POOL_SIZE = int(os.environ.get("IMAGE_POOL_SIZE", 2))
+
+_image_pool = None
+_image_pool_lock = threading.Lock()
+
+def get_image_pool(broken=None):
+    """Returns this process's image pool, replacing `broken` if passed.
+
+    A pool whose child died (OOM kill, decoder crash) stays unusable, so
+    callers hand it back here to get a fresh one.
+    """
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None or _image_pool is broken:
+            if broken is not None: broken.shutdown(wait=False)
+            _image_pool = ProcessPoolExecutor(
+                max_workers=IMAGE_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _image_pool
+
 @app.route('/convert-file', methods=['POST'])
 def convert_file():
     increment_stat('file_conv')
@@ -477,10 +784,17 @@ def convert_file():
     fmt = request.form.get('format', 'PNG').upper()
     try:
         img = PIL.Image.open(file)
-        if fmt in ['JPG', 'JPEG']: img = img.convert('RGB'); fmt = 'JPEG'
+        save_opts = {}
+        if fmt in ['JPG', 'JPEG']:
+            img = img.convert('RGB'); fmt = 'JPEG'
+            save_opts = {"optimize": True, "progressive": True}
+        buf = BytesIO()
+        img.save(buf, format=fmt, **save_opts)
+        data = buf.getvalue()
+        if fmt == 'JPEG': data = mozjpeg_lossless_optimization.optimize(data)
         fname = f"conv_{uuid.uuid4().hex[:8]}.{fmt.lower()}"
-        path = os.path.join(STATIC_FOLDER, fname)
-        img.save(path, format=fmt)
+        with open(os.path.join(STATIC_FOLDER, fname), "wb") as f:
+            f.write(data)
         return jsonify({"success": True, "file_url": f"/static/{fname}"})
     except Exception as e: return jsonify({"success": False, "error": str(e)}), 500
 
@@ -490,12 +804,49 @@ def compress_image():
     if 'file' not in request.files: return jsonify({"success": False, "error": "No file"}), 400
     file = request.files['file']
     try:
-        img = PIL.Image.open(file).convert('RGB')
+        data = compress_to_jpeg(file)
         fname = f"comp_{uuid.uuid4().hex[:8]}.jpg"
-        path = os.path.join(STATIC_FOLDER, fname)
-        img.save(path, "JPEG", optimize=True, quality=30)
+        with open(os.path.join(STATIC_FOLDER, fname), "wb") as f:
+            f.write(data)
         return jsonify({"success": True, "file_url": f"/static/{fname}"})
     except Exception as e: return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route('/compress-image-batch', methods=['POST'])
+def compress_image_batch():
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files: return jsonify({"success": False, "error": "No files"}), 400
+    if len(files) > BATCH_MAX_FILES:
+        return jsonify({"success": False, "error": f"Max {BATCH_MAX_FILES} files per batch"}), 400
+
+    uploads = [(f.filename, f.read()) for f in files]
+    pool = get_image_pool()
+    try:
+        futures = [pool.submit(compress_jpeg_bytes, data) for _, data in uploads]
+    except BrokenProcessPool:
+        pool = get_image_pool(broken=pool)
+        futures = [pool.submit(compress_jpeg_bytes, data) for _, data in uploads]
+
+    # One result per file, so a single unreadable upload doesn't sink the batch
+    results, pool_broken = [], False
+    for (name, _), future in zip(uploads, futures):
+        try:
+            file_url = save_static_file(f"comp_{uuid.uuid4().hex[:8]}.jpg", future.result())
+            increment_stat('compression')
+            results.append({"filename": name, "success": True, "file_url": file_url})
+        except BrokenProcessPool:
+            pool_broken = True
+            results.append({"filename": name, "success": False, "error": "Image worker crashed"})
+        except Exception as e:
+            results.append({"filename": name, "success": False, "error": str(e)})
+    if pool_broken:
+        get_image_pool(broken=pool)
+
+    return jsonify({"success": any(r["success"] for r in results), "results": results})
+
+# Development server only; production runs under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    debug = os.environ.get("FLASK_DEBUG") == "1"
+    # With the reloader on, only the child process that serves requests runs jobs
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs()
+    app.run(host='0.0.0.0', port=5000, debug=debug)
\ No newline at end of file
@@ -0,0 +1,41 @@
+import os
+import multiprocessing
+
+# --- WORKERS ---
+# Threaded workers: requests mostly wait on Groq, gTTS or ffmpeg, so each
+# process serves several at once. Usage counters are per process unless
+# they live in Redis, so without REDIS_URL a single worker keeps the admin
+# stats correct. WEB_CONCURRENCY overrides the process count.
+worker_class = "gthread"
+_default_workers = multiprocessing.cpu_count() if os.environ.get("REDIS_URL") else 1
+workers = int(os.environ.get("WEB_CONCURRENCY", _default_workers))
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Import the app once in the master so workers share its memory copy-on-write
+preload_app = True
+
+# gthread workers heartbeat from their main loop, so this never cuts off a
+# long request thread. It does bound worker boot, which includes loading
+# the Whisper model in post_fork below.
+timeout = 120
+
+# Model warm-up is best effort: if it fails the server still boots, and
+# get_asr_model() retries on the first /audio-to-text request.
+
+def on_starting(server):
+    # Download the Whisper weights once, before any worker needs them
+    from app import download_asr_model
+    try:
+        download_asr_model()
+    except Exception as e:
+        print(f"ASR Model Download Error: {e}")
+
+def post_fork(server, worker):
+    # Background threads run only in workers, never in the forking master
+    from app import start_background_jobs, get_asr_model
+    start_background_jobs()
+    # Load the model at boot rather than on the first transcription request
+    try:
+        get_asr_model()
+    except Exception:
+        pass  # already logged by get_asr_model()
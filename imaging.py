@@ -0,0 +1,30 @@
+"""Image compression helpers.
+
+Kept free of Flask and app imports: the batch endpoint runs these in
+spawned worker processes, which should not load the whole web app.
+"""
+from io import BytesIO
+
+import PIL.Image
+import mozjpeg_lossless_optimization
+
+# Compressed output is capped to fit inside this box (aspect ratio kept)
+COMPRESS_MAX_SIZE = (1600, 1600)
+
+def compress_to_jpeg(fp):
+    """Encodes an image as a quality-30 JPEG and returns the bytes."""
+    img = PIL.Image.open(fp)
+    # For JPEG sources, let libjpeg decode at a reduced 1/2, 1/4 or 1/8 scale.
+    # It only picks a scale that keeps both edges >= 1600px, so this helps
+    # very large images; thumbnail() then does the actual resize to the cap.
+    img.draft('RGB', COMPRESS_MAX_SIZE)
+    img = img.convert('RGB')
+    img.thumbnail(COMPRESS_MAX_SIZE)
+    buf = BytesIO()
+    img.save(buf, "JPEG", optimize=True, quality=30)
+    # Lossless mozjpeg pass: smaller file, identical pixels
+    return mozjpeg_lossless_optimization.optimize(buf.getvalue())
+
+def compress_jpeg_bytes(data):
+    """Picklable entry point for process pools: raw upload bytes in, JPEG out."""
+    return compress_to_jpeg(BytesIO(data))